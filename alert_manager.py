@@ -1,24 +1,96 @@
+import os
+import sys
+
+try:
+    # Optional io_uring path (Linux >= 5.6): a batch of queued log writes
+    # costs one io_uring_enter syscall instead of one write(2) per line.
+    from pyuring import UringCtx
+except ImportError:
+    UringCtx = None
+
+# Queued lines are submitted together once this many alerts accumulate
+_URING_BATCH_SIZE = 16
+
+# Labels for the common alert keys, pre-rendered exactly as
+# key.replace('_', ' ').title() would produce them; unknown keys still go
+# through the dynamic form.
+_LABELS = {
+    "symbol": "Symbol",
+    "type": "Type",
+    "description": "Description",
+    "current_price": "Current Price",
+    "current_volume": "Current Volume",
+    "SMA": "Sma",
+    "StdDev": "Stddev",
+    "timestamp": "Timestamp",
+}
+
 class AlertManager:
+    def __init__(self, log_file_path="anomaly_log.txt"):
+        self.log_file_path = log_file_path
+        # Raw O_APPEND descriptor: each alert is one atomic write(2) with no
+        # TextIOWrapper encoding or BufferedWriter copy in between.
+        try:
+            self._log_fd = os.open(log_file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        except OSError as e:
+            print(f"Error opening log file {log_file_path}: {e}")
+            self._log_fd = None
+
+        # io_uring batching is only worth it (and only available) on Linux;
+        # anywhere else the plain os.write path below is used.
+        self._uring = None
+        self._uring_batch = []
+        if UringCtx is not None and sys.platform == "linux" and self._log_fd is not None:
+            try:
+                self._uring = UringCtx()
+            except OSError:
+                self._uring = None
+
+    def _flush_uring_batch(self):
+        """Submits all queued log lines with a single io_uring_enter."""
+        if not self._uring_batch:
+            return
+        for buf in self._uring_batch:
+            self._uring.write(self._log_fd, buf, 0) # O_APPEND ignores the offset
+        self._uring.submit_and_wait(min_complete=len(self._uring_batch))
+        self._uring_batch.clear()
+
+    def close(self):
+        """Closes the log file descriptor. Call once at shutdown."""
+        if self._uring is not None:
+            self._flush_uring_batch()
+            self._uring = None
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+            self._log_fd = None
+
     def send_alert(self, anomaly_info):
         """Prints the anomaly details to the console and logs it."""
-        print("\n" + "="*40)
-        print("!!! REAL-TIME ANOMALY DETECTED !!!")
-        print("="*40)
-        for key, value in anomaly_info.items():
-            print(f"- {key.replace('_', ' ').title()}: {value}")
-        print("="*40 + "\n")
+        # One assembled message and one stdout write per alert, instead of a
+        # syscall per banner line and per key on a line-buffered TTY
+        get_label = _LABELS.get
+        lines = ["", "="*40, "!!! REAL-TIME ANOMALY DETECTED !!!", "="*40]
+        lines.extend(f"- {get_label(key) or key.replace('_', ' ').title()}: {value}"
+                     for key, value in anomaly_info.items())
+        lines.append("="*40 + "\n")
+        sys.stdout.write("\n".join(lines) + "\n")
 
         self.log_alert(anomaly_info)
 
     def log_alert(self, anomaly_info):
         """Logs anomaly information to a file."""
-        log_file_path = "anomaly_log.txt"
+        if self._log_fd is None:
+            return
+        line = f"[{anomaly_info.get('timestamp', 'N/A')}] ANOMALY: Symbol={anomaly_info.get('symbol', 'N/A')}, Type='{anomaly_info.get('type', 'N/A')}', Description='{anomaly_info.get('description', 'N/A')}'\n"
         try:
-            with open(log_file_path, "a") as f:
-                f.write(f"[{anomaly_info.get('timestamp', 'N/A')}] ANOMALY: Symbol={anomaly_info.get('symbol', 'N/A')}, Type='{anomaly_info.get('type', 'N/A')}', Description='{anomaly_info.get('description', 'N/A')}'\n")
-            print(f"Anomaly logged to {log_file_path}")
-        except IOError as e:
-            print(f"Error writing to log file {log_file_path}: {e}")
+            if self._uring is not None:
+                self._uring_batch.append(line.encode())
+                if len(self._uring_batch) >= _URING_BATCH_SIZE:
+                    self._flush_uring_batch()
+            else:
+                os.write(self._log_fd, line.encode())
+        except OSError as e:
+            print(f"Error writing to log file {self.log_file_path}: {e}")
 
     # You can add methods for other alert types (email, SMS, Discord, etc.)
     # def send_email_alert(self, anomaly_info):
@@ -49,4 +121,5 @@ if __name__ == "__main__":
         "StdDev": 3.2,
         "timestamp": "2025-07-08 10:06:00"
     }
-    am.send_alert(sample_anomaly_2)
\ No newline at end of file
+    am.send_alert(sample_anomaly_2)
+    am.close()
\ No newline at end of file
@@ -1,109 +1,185 @@
-import pandas as pd
-from config import PRICE_CHANGE_THRESHOLD, STD_DEV_MULTIPLIER
-
-class AnomalyDetector:
-    def detect_anomalies(self, processed_data):
-        anomalies = []
-        for symbol, data in processed_data.items():
-            # Ensure required data points exist for calculations
-            if not isinstance(data, dict): # Check if data is a dictionary
-                print(f"Skipping anomaly detection for {symbol}: Invalid data format.")
-                continue
-
-            # Critical data points for anomaly detection
-            current_close = data.get('close')
-            sma = data.get('SMA')
-            std_dev = data.get('StdDev')
-            percentage_change = data.get('PercentageChange')
-            timestamp = data.get('timestamp')
-
-            if current_close is None or timestamp is None:
-                print(f"Skipping anomaly detection for {symbol}: Missing critical price or timestamp data.")
-                continue
-
-            # Anomaly Rule 1: Sudden Price Change
-            if percentage_change is not None and abs(percentage_change) >= PRICE_CHANGE_THRESHOLD:
-                anomalies.append({
-                    "symbol": symbol,
-                    "type": "Sudden Price Change",
-                    "description": f"Price changed by {percentage_change:.2%} in the last interval.",
-                    "current_price": current_close,
-                    "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S') if isinstance(timestamp, pd.Timestamp) else str(timestamp)
-                })
-
-            # Anomaly Rule 2: Significant Deviation from Moving Average (Volatility Spike)
-            if sma is not None and std_dev is not None and std_dev > 0: # Avoid division by zero
-                deviation = abs(current_close - sma) / std_dev
-                if deviation >= STD_DEV_MULTIPLIER:
-                    anomalies.append({
-                        "symbol": symbol,
-                        "type": "Significant Deviation from SMA",
-                        "description": f"Price is {deviation:.2f} standard deviations away from its {data.get('SMA_window_size', 'N/A')}-period SMA.",
-                        "current_price": current_close,
-                        "SMA": sma,
-                        "StdDev": std_dev,
-                        "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S') if isinstance(timestamp, pd.Timestamp) else str(timestamp)
-                    })
-            elif std_dev == 0 and abs(current_close - sma) > 0: # Special case for no StdDev but price moved
-                 anomalies.append({
-                    "symbol": symbol,
-                    "type": "Price Movement with Zero Volatility",
-                    "description": "Price moved but standard deviation is zero (insufficient historical data or constant price).",
-                    "current_price": current_close,
-                    "SMA": sma,
-                    "StdDev": std_dev,
-                    "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S') if isinstance(timestamp, pd.Timestamp) else str(timestamp)
-                })
-
-            # You can add more anomaly rules here (e.g., volume spikes)
-            # if 'PercentageVolumeChange' in data and data['PercentageVolumeChange'] is not None:
-            #     VOLUME_SPIKE_THRESHOLD = 2.0 # e.g., 200% increase
-            #     if data['PercentageVolumeChange'] >= VOLUME_SPIKE_THRESHOLD:
-            #         anomalies.append({
-            #             "symbol": symbol,
-            #             "type": "Volume Spike",
-            #             "description": f"Volume increased by {data['PercentageVolumeChange']:.2%}.",
-            #             "current_volume": data['volume'],
-            #             "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S') if isinstance(timestamp, pd.Timestamp) else str(timestamp)
-            #         })
-
-        return anomalies
-
-# For testing this module independently
-if __name__ == "__main__":
-    ad = AnomalyDetector()
-    # Create some dummy processed data that would trigger anomalies
-    sample_processed_data = {
-        "IBM": {
-            "symbol": "IBM",
-            "timestamp": pd.to_datetime("2025-07-08 10:05:00"),
-            "close": 105.0,
-            "volume": 1500,
-            "SMA": 100.0,
-            "StdDev": 1.5,
-            "PriceChange": 5.0,
-            "PercentageChange": 0.05 # 5% change, higher than threshold
-        },
-        "MSFT": {
-            "symbol": "MSFT",
-            "timestamp": pd.to_datetime("2025-07-08 10:05:00"),
-            "close": 208.0, # This would be 2.5 std devs from 201 with 2.0 std dev
-            "volume": 2200,
-            "SMA": 201.0,
-            "StdDev": 2.0, # Let's say normal std dev is 2.0
-            "PriceChange": 7.0,
-            "PercentageChange": 0.03 # Exactly 3% change
-        },
-        "GOOGL": { # No anomaly
-            "symbol": "GOOGL",
-            "timestamp": pd.to_datetime("2025-07-08 10:05:00"),
-            "close": 150.0,
-            "volume": 500,
-            "SMA": 150.5,
-            "StdDev": 0.2,
-            "PriceChange": -0.5,
-            "PercentageChange": -0.003
-        }
-    }
-    anomalies = ad.detect_anomalies(sample_processed_data)
+import numpy as np
+import pandas as pd
+from config import PRICE_CHANGE_THRESHOLD, STD_DEV_MULTIPLIER
+
+def _as_float(value):
+    """None (missing indicator) becomes NaN so it never matches a threshold."""
+    return np.nan if value is None else value
+
+# Description templates bound once instead of re-created per alert
+_PCT_DESC = "Price changed by {:.2%} in the last interval.".format
+_DEV_DESC = "Price is {:.2f} standard deviations away from its {}-period SMA.".format
+
+class _LazyStr:
+    """Defers description formatting until the alert is actually rendered,
+    so filtered or silenced alert channels never pay for it."""
+    __slots__ = ("_func", "_args")
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self):
+        return self._func(*self._args)
+
+    __repr__ = __str__
+
+def _make_mask_builder(pct_threshold, std_multiplier, enabled_rules):
+    """Compiles the vectorized rule pass with the thresholds inlined as
+    literal constants and disabled rules omitted entirely, so the per-cycle
+    hot path carries no dead branches and compares against LOAD_CONST values
+    instead of threshold variables."""
+    lines = ["def _build_masks(closes, smas, stds, pcts):"]
+    if "pct" in enabled_rules:
+        # Anomaly Rule 1: Sudden Price Change (NaN comparisons are False)
+        lines.append(f"    pct_mask = np.abs(pcts) >= {pct_threshold!r}")
+    else:
+        lines.append("    pct_mask = np.zeros(len(closes), dtype=bool)")
+    if "sma" in enabled_rules:
+        # Anomaly Rule 2: Significant Deviation from Moving Average, plus the
+        # zero-volatility special case
+        lines.append("    with np.errstate(divide='ignore', invalid='ignore'):")
+        lines.append("        deviations = np.abs(closes - smas) / stds")
+        lines.append(f"    dev_mask = (stds > 0) & (deviations >= {std_multiplier!r})")
+        lines.append("    zero_vol_mask = (stds == 0) & (np.abs(closes - smas) > 0)")
+    else:
+        lines.append("    deviations = np.zeros(len(closes))")
+        lines.append("    dev_mask = np.zeros(len(closes), dtype=bool)")
+        lines.append("    zero_vol_mask = dev_mask")
+    lines.append("    return pct_mask, dev_mask, zero_vol_mask, deviations")
+    namespace = {"np": np}
+    exec("\n".join(lines), namespace)
+    return namespace["_build_masks"]
+
+class AnomalyDetector:
+    def __init__(self, enabled_rules=("pct", "sma")):
+        # Specialize the rule pass once for the configured thresholds and
+        # rule set; detect_anomalies just calls the compiled closure.
+        self._build_masks = _make_mask_builder(PRICE_CHANGE_THRESHOLD,
+                                               STD_DEV_MULTIPLIER,
+                                               enabled_rules)
+
+    def detect_anomalies(self, processed_data):
+        anomalies = []
+        if not processed_data:
+            return anomalies
+
+        # Gather a struct-of-arrays view of the per-symbol dicts so both rules
+        # are evaluated in one vectorized pass; Python-level work then only
+        # happens for the (usually sparse) symbols that actually fired.
+        symbols = []
+        entries = []
+        closes, smas, stds, pcts = [], [], [], []
+        for symbol, data in processed_data.items():
+            # EAFP: index the critical fields directly and let the rare bad
+            # entry raise, instead of paying isinstance/.get probes per symbol
+            try:
+                close = data['close']
+                timestamp = data['timestamp']
+            except TypeError: # Entry is not a dict
+                print(f"Skipping anomaly detection for {symbol}: Invalid data format.")
+                continue
+            except KeyError:
+                print(f"Skipping anomaly detection for {symbol}: Missing critical price or timestamp data.")
+                continue
+            if close is None or timestamp is None:
+                print(f"Skipping anomaly detection for {symbol}: Missing critical price or timestamp data.")
+                continue
+            symbols.append(symbol)
+            entries.append(data)
+            closes.append(close)
+            smas.append(_as_float(data.get('SMA'))) # .get only for truly optional keys
+            stds.append(_as_float(data.get('StdDev')))
+            pcts.append(_as_float(data.get('PercentageChange')))
+
+        if not symbols:
+            return anomalies
+
+        closes = np.asarray(closes, dtype=np.float64)
+        smas = np.asarray(smas, dtype=np.float64)
+        stds = np.asarray(stds, dtype=np.float64)
+        pcts = np.asarray(pcts, dtype=np.float64)
+
+        pct_mask, dev_mask, zero_vol_mask, deviations = self._build_masks(closes, smas, stds, pcts)
+
+        for i in np.flatnonzero(pct_mask | dev_mask | zero_vol_mask):
+            symbol = symbols[i]
+            data = entries[i]
+            current_close = float(closes[i])
+            timestamp = data['timestamp']
+            # isoformat avoids the libc strftime path and is computed once per hit
+            ts_str = timestamp.isoformat(sep=' ', timespec='seconds') if isinstance(timestamp, pd.Timestamp) else str(timestamp)
+
+            if pct_mask[i]:
+                anomalies.append({
+                    "symbol": symbol,
+                    "type": "Sudden Price Change",
+                    "description": _LazyStr(_PCT_DESC, float(pcts[i])),
+                    "current_price": current_close,
+                    "timestamp": ts_str
+                })
+
+            if dev_mask[i]:
+                anomalies.append({
+                    "symbol": symbol,
+                    "type": "Significant Deviation from SMA",
+                    "description": _LazyStr(_DEV_DESC, float(deviations[i]), data.get('SMA_window_size', 'N/A')),
+                    "current_price": current_close,
+                    "SMA": float(smas[i]),
+                    "StdDev": float(stds[i]),
+                    "timestamp": ts_str
+                })
+            elif zero_vol_mask[i]:
+                anomalies.append({
+                    "symbol": symbol,
+                    "type": "Price Movement with Zero Volatility",
+                    "description": "Price moved but standard deviation is zero (insufficient historical data or constant price).",
+                    "current_price": current_close,
+                    "SMA": float(smas[i]),
+                    "StdDev": float(stds[i]),
+                    "timestamp": ts_str
+                })
+
+            # You can add more anomaly rules here (e.g., volume spikes) by
+            # gathering the extra column above and adding its mask to the union.
+
+        return anomalies
+
+# For testing this module independently
+if __name__ == "__main__":
+    ad = AnomalyDetector()
+    # Create some dummy processed data that would trigger anomalies
+    sample_processed_data = {
+        "IBM": {
+            "symbol": "IBM",
+            "timestamp": pd.to_datetime("2025-07-08 10:05:00"),
+            "close": 105.0,
+            "volume": 1500,
+            "SMA": 100.0,
+            "StdDev": 1.5,
+            "PriceChange": 5.0,
+            "PercentageChange": 0.05 # 5% change, higher than threshold
+        },
+        "MSFT": {
+            "symbol": "MSFT",
+            "timestamp": pd.to_datetime("2025-07-08 10:05:00"),
+            "close": 208.0, # This would be 2.5 std devs from 201 with 2.0 std dev
+            "volume": 2200,
+            "SMA": 201.0,
+            "StdDev": 2.0, # Let's say normal std dev is 2.0
+            "PriceChange": 7.0,
+            "PercentageChange": 0.03 # Exactly 3% change
+        },
+        "GOOGL": { # No anomaly
+            "symbol": "GOOGL",
+            "timestamp": pd.to_datetime("2025-07-08 10:05:00"),
+            "close": 150.0,
+            "volume": 500,
+            "SMA": 150.5,
+            "StdDev": 0.2,
+            "PriceChange": -0.5,
+            "PercentageChange": -0.003
+        }
+    }
+    anomalies = ad.detect_anomalies(sample_processed_data)
     print("Detected anomalies:", anomalies)
\ No newline at end of file
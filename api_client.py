@@ -1,123 +1,367 @@
-import requests
-import time
-from config import ALPHA_VANTAGE_API_KEY, FINNHUB_API_KEY # Import from config
-
-class APIClient:
-    def __init__(self, api_source="alpha_vantage"):
-        self.api_source = api_source
-        if self.api_source == "alpha_vantage":
-            self.api_key = ALPHA_VANTAGE_API_KEY
-            self.base_url = "https://www.alphavantage.co/query"
-            self.rate_limit_delay = 15 # Alpha Vantage free tier is 5 calls per minute
-        elif self.api_source == "finnhub":
-            self.api_key = FINNHUB_API_KEY
-            self.base_url = "https://finnhub.io/api/v1"
-            self.rate_limit_delay = 1 # Finnhub free tier is 30 calls/sec for some endpoints
-        else:
-            raise ValueError("Unsupported API source. Choose 'alpha_vantage' or 'finnhub'.")
-
-    def get_stock_data(self, symbol, interval='1min'):
-        if not self.api_key:
-            print(f"Error: {self.api_source} API key not set. Please check your .env file.")
-            return None
-
-        data = None
-        if self.api_source == "alpha_vantage":
-            params = {
-                "function": "TIME_SERIES_INTRADAY",
-                "symbol": symbol,
-                "interval": interval,
-                "apikey": self.api_key,
-                "outputsize": "compact" # Get only the most recent 100 data points
-            }
-            try:
-                r = requests.get(self.base_url, params=params)
-                r.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-                raw_data = r.json()
-                
-                if "Time Series (1min)" in raw_data:
-                    # Get the latest data point
-                    latest_timestamp = list(raw_data["Time Series (1min)"].keys())[0]
-                    latest_data = raw_data["Time Series (1min)"][latest_timestamp]
-                    data = {
-                        "symbol": symbol,
-                        "timestamp": latest_timestamp,
-                        "open": float(latest_data["1. open"]),
-                        "high": float(latest_data["2. high"]),
-                        "low": float(latest_data["3. low"]),
-                        "close": float(latest_data["4. close"]),
-                        "volume": int(latest_data["5. volume"])
-                    }
-                elif "Error Message" in raw_data:
-                    print(f"Alpha Vantage API Error for {symbol}: {raw_data['Error Message']}")
-                elif "Note" in raw_data:
-                     # This is often for rate limit warnings
-                    print(f"Alpha Vantage API Note/Warning for {symbol}: {raw_data['Note']}")
-                else:
-                    print(f"Unexpected Alpha Vantage API response for {symbol}: {raw_data}")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Alpha Vantage API request failed for {symbol}: {e}")
-            except ValueError as e:
-                print(f"Error parsing Alpha Vantage data for {symbol}: {e}")
-        
-        elif self.api_source == "finnhub":
-            # Finnhub provides real-time quotes, not historical intraday like AV for free tier
-            # For this project, a single quote might be enough if you want very real-time updates.
-            # However, to calculate moving averages, you need a series of points.
-            # Finnhub's free tier for intraday candles (like AV's 1min) is often limited.
-            # Let's use a simple quote for real-time price, but note it won't support MAs directly from this endpoint.
-            params = {
-                "symbol": symbol,
-                "token": self.api_key
-            }
-            try:
-                r = requests.get(f"{self.base_url}/quote", params=params)
-                r.raise_for_status()
-                raw_data = r.json()
-                if raw_data and raw_data.get('c'): # 'c' is current price
-                    data = {
-                        "symbol": symbol,
-                        "timestamp": pd.to_datetime('now').strftime('%Y-%m-%d %H:%M:%S'), # Finnhub quote lacks timestamp
-                        "open": raw_data.get('o'),
-                        "high": raw_data.get('h'),
-                        "low": raw_data.get('l'),
-                        "close": raw_data.get('c'),
-                        "volume": raw_data.get('pc') # 'pc' is previous close, no volume in free quote
-                    }
-                else:
-                    print(f"Finnhub API: No current price for {symbol} or unexpected response: {raw_data}")
-            except requests.exceptions.RequestException as e:
-                print(f"Finnhub API request failed for {symbol}: {e}")
-
-        return data
-
-    def fetch_stock_data_for_symbols(self, symbols):
-        all_data = {}
-        for symbol in symbols:
-            data = self.get_stock_data(symbol)
-            if data:
-                all_data[symbol] = data
-            # Respect rate limits
-            time.sleep(self.rate_limit_delay)
-        return all_data
-
-# For testing this module independently
-if __name__ == "__main__":
-    import pandas as pd # Import here for local testing only
-    from dotenv import load_dotenv
-    load_dotenv() # Load API keys from .env
-
-    # Test Alpha Vantage
-    print("--- Testing Alpha Vantage ---")
-    av_client = APIClient(api_source="alpha_vantage")
-    data_av = av_client.fetch_stock_data_for_symbols(["IBM", "MSFT"])
-    print(data_av)
-    
-    # Test Finnhub (Note: Finnhub free tier may not have 1min candles, only quotes)
-    # The current implementation of get_stock_data for finnhub fetches a single quote.
-    # To use it for MA calculations, you'd need a different finnhub endpoint or accumulate data points.
-    print("\n--- Testing Finnhub (Quote Only) ---")
-    finnhub_client = APIClient(api_source="finnhub")
-    data_fh = finnhub_client.fetch_stock_data_for_symbols(["AAPL", "GOOGL"])
-    print(data_fh)
\ No newline at end of file
+import asyncio
+import csv
+import io
+import operator
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from config import ALPHA_VANTAGE_API_KEY, FINNHUB_API_KEY # Import from config
+
+try:
+    # orjson parses the provider payloads several times faster than the stdlib
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
+
+# (connect, read) timeouts for the sync path, in seconds
+_REQUEST_TIMEOUT = (3, 10)
+
+# Pulls all five OHLCV fields from an Alpha Vantage bar in one C-level call
+_AV_FIELDS = operator.itemgetter("1. open", "2. high", "3. low", "4. close", "5. volume")
+
+class APIClient:
+    def __init__(self, api_source="alpha_vantage"):
+        self.api_source = api_source
+        if self.api_source == "alpha_vantage":
+            self.api_key = ALPHA_VANTAGE_API_KEY
+            self.base_url = "https://www.alphavantage.co/query"
+            self.rate_limit_delay = 15 # Alpha Vantage free tier is 5 calls per minute
+            self.requests_per_second = 5 / 60 # 5 calls per minute
+            # CSV is much cheaper to parse than the nested JSON series;
+            # set to "json" to fall back to the JSON parse path.
+            self.av_datatype = "csv"
+        elif self.api_source == "finnhub":
+            self.api_key = FINNHUB_API_KEY
+            self.base_url = "https://finnhub.io/api/v1"
+            self.rate_limit_delay = 1 # Finnhub free tier is 30 calls/sec for some endpoints
+            self.requests_per_second = 30
+        else:
+            raise ValueError("Unsupported API source. Choose 'alpha_vantage' or 'finnhub'.")
+
+        # Retry budget for rate-limited responses (HTTP 429 or an Alpha
+        # Vantage "Note" body), with exponentially growing capped delays.
+        self.max_retries = 3
+        self.backoff_base = 2.0
+        self.backoff_cap = 30.0
+
+        # One Session for the life of the client: keep-alive reuses the TCP/TLS
+        # connection to the provider instead of a fresh handshake per symbol.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.5,
+                              status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Shared aiohttp session, created lazily on the event loop at first
+        # use and reused across monitoring cycles (see _get_async_session).
+        self._async_session = None
+
+    def close(self):
+        """Closes the underlying HTTP session. Call once at shutdown."""
+        self.session.close()
+
+    def _get_async_session(self):
+        """Returns the shared aiohttp session, creating it on first use.
+
+        Keeping one connector for the life of the client preserves the
+        provider connection pool, TLS sessions, and DNS cache across cycles
+        instead of re-resolving and re-handshaking every SCHEDULE interval.
+        """
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=64,
+                                             ttl_dns_cache=300, keepalive_timeout=120)
+            self._async_session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=15))
+        return self._async_session
+
+    async def aclose(self):
+        """Closes the shared aiohttp session. Async counterpart of close()."""
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt`, honouring a
+        Retry-After header when the provider sent one."""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_cap)
+        return delay + random.uniform(0, 1) # Jitter to avoid thundering herds
+
+    def _build_request(self, symbol, interval):
+        """Returns the (url, params) pair for the configured API source."""
+        if self.api_source == "alpha_vantage":
+            params = {
+                "function": "TIME_SERIES_INTRADAY",
+                "symbol": symbol,
+                "interval": interval,
+                "apikey": self.api_key,
+                "outputsize": "compact", # Get only the most recent 100 data points
+                "datatype": self.av_datatype
+            }
+            return self.base_url, params
+        else:
+            params = {
+                "symbol": symbol,
+                "token": self.api_key
+            }
+            return f"{self.base_url}/quote", params
+
+    def _parse_alpha_vantage_response(self, symbol, raw_data):
+        """Extracts the latest data point from an Alpha Vantage intraday response."""
+        series = raw_data.get("Time Series (1min)")
+        if series:
+            # Get the latest data point (first key) without materializing the
+            # full keys view as a list
+            latest_timestamp = next(iter(series))
+            o, h, l, c, v = _AV_FIELDS(series[latest_timestamp])
+            return {
+                "symbol": symbol,
+                "timestamp": latest_timestamp,
+                "open": float(o),
+                "high": float(h),
+                "low": float(l),
+                "close": float(c),
+                "volume": int(v)
+            }
+        elif "Error Message" in raw_data:
+            print(f"Alpha Vantage API Error for {symbol}: {raw_data['Error Message']}")
+        elif "Note" in raw_data:
+            # This is often for rate limit warnings
+            print(f"Alpha Vantage API Note/Warning for {symbol}: {raw_data['Note']}")
+        else:
+            print(f"Unexpected Alpha Vantage API response for {symbol}: {raw_data}")
+        return None
+
+    def _parse_alpha_vantage_csv(self, symbol, text):
+        """Extracts the latest data point from an Alpha Vantage CSV response.
+
+        Only the first data row (newest bar) is ever read, so nothing beyond
+        the header and one line is parsed.
+        """
+        reader = csv.reader(io.StringIO(text))
+        try:
+            next(reader) # Header row: timestamp,open,high,low,close,volume
+            latest_timestamp, o, h, l, c, v = next(reader)
+            return {
+                "symbol": symbol,
+                "timestamp": latest_timestamp,
+                "open": float(o),
+                "high": float(h),
+                "low": float(l),
+                "close": float(c),
+                "volume": int(v)
+            }
+        except (StopIteration, ValueError):
+            print(f"Unexpected Alpha Vantage CSV response for {symbol}: {text[:200]}")
+            return None
+
+    def _parse_finnhub_response(self, symbol, raw_data):
+        """Extracts a quote from a Finnhub /quote response."""
+        if raw_data and raw_data.get('c'): # 'c' is current price
+            return {
+                "symbol": symbol,
+                "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'), # Finnhub quote lacks timestamp
+                "open": raw_data.get('o'),
+                "high": raw_data.get('h'),
+                "low": raw_data.get('l'),
+                "close": raw_data.get('c'),
+                "volume": raw_data.get('pc') # 'pc' is previous close, no volume in free quote
+            }
+        print(f"Finnhub API: No current price for {symbol} or unexpected response: {raw_data}")
+        return None
+
+    def get_stock_data(self, symbol, interval='1min'):
+        if not self.api_key:
+            print(f"Error: {self.api_source} API key not set. Please check your .env file.")
+            return None
+
+        data = None
+        url, params = self._build_request(symbol, interval)
+        if self.api_source == "alpha_vantage":
+            # Transport-level 429/5xx retries are handled by the adapter's
+            # urllib3 Retry; this loop covers the rate-limit "Note" that
+            # Alpha Vantage returns with HTTP 200.
+            for attempt in range(self.max_retries + 1):
+                try:
+                    r = self.session.get(url, params=params, timeout=_REQUEST_TIMEOUT)
+                    r.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+                    body = r.content
+                except requests.exceptions.RequestException as e:
+                    print(f"Alpha Vantage API request failed for {symbol}: {e}")
+                    break
+                # Errors and rate-limit Notes arrive as JSON even when CSV was
+                # requested, so branch on the payload rather than the datatype.
+                if body[:1] == b"{":
+                    try:
+                        raw_data = _json_loads(body)
+                    except ValueError as e:
+                        print(f"Error parsing Alpha Vantage data for {symbol}: {e}")
+                        break
+                    if "Note" in raw_data and attempt < self.max_retries:
+                        delay = self._backoff_delay(attempt)
+                        print(f"Alpha Vantage rate limited for {symbol}; retrying in {delay:.1f}s...")
+                        time.sleep(delay)
+                        continue
+                    data = self._parse_alpha_vantage_response(symbol, raw_data)
+                else:
+                    data = self._parse_alpha_vantage_csv(symbol, r.text)
+                break
+
+        elif self.api_source == "finnhub":
+            # Finnhub provides real-time quotes, not historical intraday like AV for free tier
+            # For this project, a single quote might be enough if you want very real-time updates.
+            # However, to calculate moving averages, you need a series of points.
+            # Finnhub's free tier for intraday candles (like AV's 1min) is often limited.
+            # Let's use a simple quote for real-time price, but note it won't support MAs directly from this endpoint.
+            try:
+                r = self.session.get(url, params=params, timeout=_REQUEST_TIMEOUT)
+                r.raise_for_status()
+                raw_data = _json_loads(r.content)
+                data = self._parse_finnhub_response(symbol, raw_data)
+            except requests.exceptions.RequestException as e:
+                print(f"Finnhub API request failed for {symbol}: {e}")
+
+        return data
+
+    async def _get_stock_data_async(self, session, symbol, interval='1min'):
+        if not self.api_key:
+            print(f"Error: {self.api_source} API key not set. Please check your .env file.")
+            return None
+
+        url, params = self._build_request(symbol, interval)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.get(url, params=params) as r:
+                    if r.status == 429 and attempt < self.max_retries:
+                        delay = self._backoff_delay(attempt, r.headers.get("Retry-After"))
+                        print(f"{self.api_source} rate limited for {symbol}; retrying in {delay:.1f}s...")
+                        await asyncio.sleep(delay)
+                        continue
+                    r.raise_for_status()
+                    body = await r.read()
+            except aiohttp.ClientError as e:
+                print(f"{self.api_source} API request failed for {symbol}: {e}")
+                return None
+
+            if self.api_source == "alpha_vantage" and body[:1] != b"{":
+                return self._parse_alpha_vantage_csv(symbol, body.decode())
+            try:
+                raw_data = _json_loads(body)
+            except ValueError as e:
+                print(f"Error parsing {self.api_source} data for {symbol}: {e}")
+                return None
+            # Alpha Vantage reports rate limiting as a "Note" body with HTTP 200
+            if self.api_source == "alpha_vantage" and "Note" in raw_data and attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                print(f"Alpha Vantage rate limited for {symbol}; retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                continue
+            break
+
+        if self.api_source == "alpha_vantage":
+            return self._parse_alpha_vantage_response(symbol, raw_data)
+        return self._parse_finnhub_response(symbol, raw_data)
+
+    async def fetch_stock_data_for_symbols_async(self, symbols):
+        """
+        Fetches all symbols concurrently with aiohttp.
+
+        A semaphore sized to the provider's per-second budget bounds how many
+        requests are in flight, and each slot is held for one request interval
+        (a simple token-bucket tick) so the provider's rate limit is respected
+        even though the requests themselves overlap.
+        """
+        semaphore = asyncio.Semaphore(max(1, int(self.requests_per_second)))
+        request_interval = 1 / self.requests_per_second
+
+        async def fetch_one(symbol):
+            async with semaphore:
+                data = await self._get_stock_data_async(session, symbol)
+                await asyncio.sleep(request_interval) # Token-bucket tick
+                return data
+
+        session = self._get_async_session()
+        results = await asyncio.gather(
+            *(fetch_one(symbol) for symbol in symbols),
+            return_exceptions=True
+        )
+
+        all_data = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                print(f"{self.api_source} API request failed for {symbol}: {result}")
+            elif result:
+                all_data[symbol] = result
+        return all_data
+
+    def fetch_stock_data_for_symbols(self, symbols):
+        """
+        Sync counterpart of fetch_stock_data_for_symbols_async (which remains
+        the preferred path): fans the per-symbol requests out to a thread pool,
+        since requests releases the GIL during I/O. A token bucket refilled at
+        the provider's rate keeps the overall request rate legal while the
+        requests themselves overlap instead of sleeping back-to-back.
+        """
+        if not symbols:
+            return {}
+
+        tokens = threading.Semaphore(max(1, int(self.requests_per_second)))
+        stop_refill = threading.Event()
+
+        def refill():
+            interval = 1 / self.requests_per_second
+            while not stop_refill.wait(interval):
+                tokens.release()
+
+        def fetch_one(symbol):
+            tokens.acquire()
+            return self.get_stock_data(symbol)
+
+        threading.Thread(target=refill, daemon=True).start()
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(symbols), 8)) as executor:
+                results = dict(zip(symbols, executor.map(fetch_one, symbols)))
+        finally:
+            stop_refill.set()
+
+        return {symbol: data for symbol, data in results.items() if data}
+
+# For testing this module independently
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv() # Load API keys from .env
+
+    async def _fetch_and_close(client, symbols):
+        try:
+            return await client.fetch_stock_data_for_symbols_async(symbols)
+        finally:
+            await client.aclose()
+
+    # Test Alpha Vantage
+    print("--- Testing Alpha Vantage ---")
+    av_client = APIClient(api_source="alpha_vantage")
+    data_av = asyncio.run(_fetch_and_close(av_client, ["IBM", "MSFT"]))
+    print(data_av)
+
+    # Test Finnhub (Note: Finnhub free tier may not have 1min candles, only quotes)
+    # The current implementation of get_stock_data for finnhub fetches a single quote.
+    # To use it for MA calculations, you'd need a different finnhub endpoint or accumulate data points.
+    print("\n--- Testing Finnhub (Quote Only) ---")
+    finnhub_client = APIClient(api_source="finnhub")
+    data_fh = asyncio.run(_fetch_and_close(finnhub_client, ["AAPL", "GOOGL"]))
+    print(data_fh)
@@ -1,5 +1,6 @@
+import asyncio
+import signal
 import time
-import schedule # pip install schedule
 from dotenv import load_dotenv # pip install python-dotenv
 
 # Import modules from your project
@@ -34,15 +35,15 @@ data_processor = DataProcessor(window_size=20)
 anomaly_detector = AnomalyDetector()
 alert_manager = AlertManager()
 
-def monitor_stocks():
+async def monitor_stocks():
     """
-    Main monitoring function executed periodically by the scheduler.
+    Main monitoring function executed periodically by the event loop.
     """
     print(f"\n[{time.ctime()}] --- Starting a new monitoring cycle ---")
     print(f"Fetching data for: {STOCKS} using {API_SOURCE}...")
 
-    # 1. Fetch Raw Data
-    raw_data = api_client.fetch_stock_data_for_symbols(STOCKS)
+    # 1. Fetch Raw Data (all symbols concurrently, rate-limited by the client)
+    raw_data = await api_client.fetch_stock_data_for_symbols_async(STOCKS)
     if not raw_data:
         print("No raw data fetched. Skipping this cycle.")
         return
@@ -67,6 +68,36 @@ def monitor_stocks():
     print(f"[{time.ctime()}] --- Monitoring cycle finished ---")
 
 
+async def monitor_loop():
+    """
+    Runs monitoring cycles forever, sleeping the interval between them.
+
+    A SIGINT handler sets a stop event so Ctrl+C wakes the loop immediately
+    instead of waiting out the interval. Additional pollers with their own
+    intervals can be added as asyncio.create_task coroutines alongside this one.
+    """
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    loop.add_signal_handler(signal.SIGINT, stop_event.set)
+
+    while not stop_event.is_set():
+        try:
+            await monitor_stocks()
+        except Exception as e:
+            print(f"An unexpected error occurred in the main loop: {e}")
+            print("Restarting monitoring after 5 seconds...")
+            await asyncio.sleep(5) # Wait a bit before retrying the loop
+            continue
+        # Sleep until the next cycle, but wake immediately on shutdown
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=SCHEDULE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    await api_client.aclose() # Release the shared HTTP session
+    print("\nMonitor stopped by user (Ctrl+C). Exiting.")
+
+
 if __name__ == "__main__":
     print("------------------------------------------------")
     print("Real-time Stock Price Anomaly Detector Started")
@@ -76,21 +107,7 @@ if __name__ == "__main__":
     print(f"Checking every {SCHEDULE_INTERVAL_SECONDS} seconds.")
     print("Press Ctrl+C to stop the monitor.")
 
-    # Schedule the monitoring function to run at the specified interval
-    schedule.every(SCHEDULE_INTERVAL_SECONDS).seconds.do(monitor_stocks)
-
-    # Initial run to fetch some data right away
-    monitor_stocks() 
-
-    # Keep the script running to allow the scheduler to work
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(1) # Sleep briefly to avoid busy-waiting and consume CPU
-        except KeyboardInterrupt:
-            print("\nMonitor stopped by user (Ctrl+C). Exiting.")
-            break
-        except Exception as e:
-            print(f"An unexpected error occurred in the main loop: {e}")
-            print("Restarting monitoring after 5 seconds...")
-            time.sleep(5) # Wait a bit before retrying the loop
\ No newline at end of file
+    try:
+        asyncio.run(monitor_loop())
+    finally:
+        alert_manager.close()
\ No newline at end of file